@@ -1,13 +1,46 @@
 """Main entry point for MAVLink Binary Log Parser."""
 
+import atexit
+import multiprocessing
 import os
 import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Any, Dict, List, Literal, Optional
 
 from src.business_logic.parallel import ParallelParser
 from src.business_logic.parser import Parser
 from src.utils.logger import setup_logger
 
+# Menus are static, so each is built once and written out in a single call
+MAIN_MENU = "\n".join(
+    [
+        "",
+        "=" * 40,
+        "   MAVLink Log Parser",
+        "=" * 40,
+        "1. Synchronous parsing",
+        "2. Parallel parsing (processes)",
+        "3. Parallel parsing (threads)",
+        "0. Exit",
+        "=" * 40,
+        "",
+    ]
+)
+
+FILTER_MENU = "\n".join(
+    [
+        "",
+        "-" * 40,
+        "   Parsing Options",
+        "-" * 40,
+        "1. Parse all messages",
+        "2. Parse specific message type",
+        "0. Back to main menu",
+        "-" * 40,
+        "",
+    ]
+)
+
 
 class CLIMenu:
     """Command-line interface for MAVLink log parsing."""
@@ -16,6 +49,25 @@ class CLIMenu:
         """Initialize the CLI with configuration."""
         self.logger = setup_logger(os.path.basename(__file__))
         self.file_path: Optional[str] = None
+        self._pools: Dict[str, Executor] = {}
+
+    def _get_pool(self, executor_type: Literal["process", "thread"]) -> Executor:
+        """Return the session's worker pool for executor_type, starting it on first use."""
+        pool = self._pools.get(executor_type)
+        if pool is None:
+            max_workers = os.cpu_count() or 1
+            if executor_type == "thread":
+                pool = ThreadPoolExecutor(max_workers=max_workers)
+            elif "forkserver" in multiprocessing.get_all_start_methods():
+                # Workers fork from a server that has already imported the parser, instead of re-importing it each
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["src.business_logic.parallel"])
+                pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            else:
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+            self._pools[executor_type] = pool
+            atexit.register(pool.shutdown)
+        return pool
 
     def _get_file_path(self) -> str:
         """Prompt user for file path and validate it."""
@@ -64,7 +116,7 @@ class CLIMenu:
             if self.file_path is None:
                 raise RuntimeError("Error: File path cannot be empty.")
             parser = ParallelParser(self.file_path)
-            messages = parser.process_all(message_type, executor_type=executor_type)
+            messages = parser.process_all(message_type, executor=self._get_pool(executor_type))
             self.logger.info(f"Parsed {len(messages):,} messages using {executor_type} pool")
             return messages
         except Exception as e:
@@ -73,24 +125,11 @@ class CLIMenu:
 
     def _display_main_menu(self) -> None:
         """Display the main menu."""
-        print("\n" + "=" * 40)
-        print("   MAVLink Log Parser")
-        print("=" * 40)
-        print("1. Synchronous parsing")
-        print("2. Parallel parsing (processes)")
-        print("3. Parallel parsing (threads)")
-        print("0. Exit")
-        print("=" * 40)
+        sys.stdout.write(MAIN_MENU)
 
     def _display_filter_menu(self) -> None:
         """Display the filter selection menu."""
-        print("\n" + "-" * 40)
-        print("   Parsing Options")
-        print("-" * 40)
-        print("1. Parse all messages")
-        print("2. Parse specific message type")
-        print("0. Back to main menu")
-        print("-" * 40)
+        sys.stdout.write(FILTER_MENU)
 
     def _get_filter_choice(self) -> Optional[bool]:
         """
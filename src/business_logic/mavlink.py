@@ -10,15 +10,16 @@ class Mavlink:
     Streams MAVLink messages as dictionaries using a generator.
     """
 
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, dialect: str = "ardupilotmega"):
         self.filename: str = filename
+        self.dialect: str = dialect
         self._mavlog = None
 
     def __enter__(self) -> "Mavlink":
         """Open the MAVLink log file using pymavlink."""
         if not os.path.exists(self.filename):
             raise FileNotFoundError(f"File not found: {self.filename}")
-        self._mavlog = mavutil.mavlink_connection(self.filename, dialect="ardupilotmega")
+        self._mavlog = mavutil.mavlink_connection(self.filename, dialect=self.dialect)
         return self
 
     def __exit__(
@@ -35,7 +36,7 @@ class Mavlink:
         :param message_type: Filter by message type (e.g. 'IMU', 'GPS', etc.)
         """
         if not self._mavlog:
-            raise RuntimeError("Parser not initialized. Use 'with PymavlinkParser(...) as parser:'")
+            raise RuntimeError("Parser not initialized. Use 'with Mavlink(...) as parser:'")
 
         while True:
             msg = self._mavlog.recv_match(type=message_type, blocking=False)
@@ -45,4 +46,8 @@ class Mavlink:
 
     def get_all_messages(self, message_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """Return all messages as a list (uses the generator internally)."""
-        return [msg for msg in self.messages(message_type)]
+        return list(self.messages(message_type))
+
+
+# Name used for this wrapper in the documentation
+PymavlinkParser = Mavlink
@@ -1,17 +1,52 @@
 """Parallel MAVLink Binary Log Parser."""
 
+import mmap
+import multiprocessing
 import os
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-from struct import Struct
-from typing import Any, Dict, List, Literal, Optional, Tuple, Type
-from itertools import repeat
+import pickle
+import struct
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Literal, Optional, Tuple, Type
+from itertools import count, repeat
 from itertools import chain
 
 from src.business_logic.parser import Parser
-from src.utils.constants import FORMAT_MAPPING, MSG_HEADER
-from src.utils.helpers import is_valid_message_header
+from src.utils.constants import FORMAT_MAPPING, FORMAT_MSG_LENGTH, FORMAT_MSG_TYPE, MSG_HEADER
+from src.utils.helpers import advise, compile_format_def, extend_columns
 from src.utils.logger import setup_logger
 
+# Chunk cuts target multiples of this, so each worker's range starts just past a page/read-ahead boundary
+CHUNK_ALIGNMENT = max(mmap.ALLOCATIONGRANULARITY, 4 * 1024 * 1024)
+
+# FMT messages are written at the start of a log, so only this much of it is walked to collect them
+FMT_SCAN_WINDOW = 64 * 1024
+
+# Chunks per worker; they are handed out one at a time, so a worker stuck on a dense stretch
+# of the log does not hold up the others waiting on one oversized chunk
+CHUNKS_PER_WORKER = 8
+
+# Chunks submitted ahead per worker, so finished chunks waiting to be consumed in order stay bounded
+CHUNKS_IN_FLIGHT = 2
+
+# Smallest chunk handed to a worker, so small logs are not split finer than their dispatch cost is worth
+MIN_CHUNK_SIZE = 10 * 1024 * 1024
+
+# Consecutive messages that must chain from a header before it is trusted as a chunk cut point
+BOUNDARY_CHAIN = 8
+
+# Per-worker state set up once by ParallelParser._init_worker (thread-local so thread workers stay isolated)
+_worker = threading.local()
+
+# Driver parsers that forked workers inherit (with their open mmap), keyed by run so concurrent runs stay apart
+_inherited: Dict[int, Parser] = {}
+
+# Tags each run: keys its entry in _inherited, and tells a caller-supplied executor's long-lived workers
+# when to set up again
+_run_ids = count()
+
 
 class ParallelParser:
     """
@@ -27,45 +62,176 @@ class ParallelParser:
         self.max_workers: int = max_workers or os.cpu_count() or 1
         self.logger = setup_logger(os.path.basename(__file__))
 
-    def process_all(self, message_type: Optional[str] = None, executor_type: Literal["process", "thread"] = "process") -> List[Dict[str, Any]]:
-        """Process the entire log file in parallel and return sorted messages."""
+    def process_all(
+        self,
+        message_type: Optional[str] = None,
+        executor_type: Literal["process", "thread"] = "process",
+        executor: Optional[Executor] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Process the entire log file in parallel and return messages in file order, as Parser would.
+        Pass an existing executor to reuse its workers across calls; executor_type then follows its kind.
+        """
         try:
+            if executor is not None:
+                executor_type = "thread" if isinstance(executor, ThreadPoolExecutor) else "process"
+
             with Parser(self.filename) as parser:
-                for _ in parser.messages("FMT"): pass
-                chunks = ParallelParser._split_to_chunks(parser, self.max_workers)
+                chunks, fmt_def, need_struct_rebuild = self._prepare(parser, executor_type)
+                executor_class = ProcessPoolExecutor if executor_type == "process" else ThreadPoolExecutor
 
-                fmt_def = {
-                    msg_id: {
-                        "Name": fmt["Name"],
-                        "Length": fmt["Length"],
-                        "Format": fmt["Format"],
-                        "Columns": fmt["Columns"],
-                        "StructStr": "<" + "".join(FORMAT_MAPPING[c] for c in fmt["Format"])
-                    }
-                    for msg_id, fmt in parser.format_defs.items()
-                } if executor_type == "process" else parser.format_defs
+                if executor is not None:
+                    chunk_results = self._run_shared_executor(
+                        executor, chunks, fmt_def, message_type, need_struct_rebuild, parser
+                    )
+                else:
+                    chunk_results = self._run_executor(
+                        executor_class, len(chunks), chunks, fmt_def, message_type, need_struct_rebuild, parent=parser
+                    )
+                results = list(chain.from_iterable(chunk_results))
 
-                need_struct_rebuild = executor_type == "process"
+            self.logger.info(f"Total messages parsed: {len(results):,}")
+            return results
 
-            if not chunks:
-                raise RuntimeError("No chunks to process.")
+        except Exception as e:
+            self.logger.error(f"Error in parallel processing: {e}")
+            raise RuntimeError(f"Error in parallel processing: {e}") from e
 
-            chunks_count = len(chunks)
-            self.logger.info(f"Processing {chunks_count} chunks with {self.max_workers} workers...")
+    def process_columns(
+        self,
+        message_type: str,
+        executor_type: Literal["process", "thread"] = "process",
+        executor: Optional[Executor] = None,
+    ) -> Dict[str, List[Any]]:
+        """
+        Process one message type in parallel and return it column-wise, as Parser.get_columns would.
+        Workers send back a few flat lists per chunk instead of a dict per message, which is far cheaper to pickle.
+        Pass an existing executor to reuse its workers across calls, as with process_all.
+        """
+        try:
+            columns: Dict[str, List[Any]] = {}
+            for chunk_columns in self._run_columns(message_type, executor_type, executor):
+                extend_columns(columns, chunk_columns)
 
-            executor_class = ProcessPoolExecutor if executor_type == "process" else ThreadPoolExecutor
+            self.logger.info(f"Total messages parsed: {len(next(iter(columns.values()), [])):,}")
+            return columns
 
-            results = self._run_executor(
-                executor_class, chunks_count, chunks, fmt_def, message_type, need_struct_rebuild
-            )
+        except Exception as e:
+            self.logger.error(f"Error in parallel processing: {e}")
+            raise RuntimeError(f"Error in parallel processing: {e}") from e
 
-            self.logger.info(f"Total messages parsed: {len(results):,}")
-            return results
+    def process_all_columns(
+        self,
+        executor_type: Literal["process", "thread"] = "process",
+        executor: Optional[Executor] = None,
+    ) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Process every message type in parallel and return it column-wise, as Parser.get_all_columns would.
+        Each worker sends back a chunk's columns per type, so no per-message object crosses the process boundary.
+        """
+        try:
+            tables: Dict[str, Dict[str, List[Any]]] = {}
+            for chunk_tables in self._run_columns(None, executor_type, executor):
+                for name, chunk_columns in chunk_tables.items():
+                    extend_columns(tables.setdefault(name, {}), chunk_columns)
+
+            self.logger.info(f"Total message types parsed: {len(tables):,}")
+            return tables
 
         except Exception as e:
             self.logger.error(f"Error in parallel processing: {e}")
             raise RuntimeError(f"Error in parallel processing: {e}") from e
 
+    def iter_results(
+        self,
+        message_type: Optional[str] = None,
+        executor_type: Literal["process", "thread"] = "process",
+        spool: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Process the entire log file in parallel and yield messages in file order, starting as soon as the first chunk is done.
+        With spool, each worker writes its chunk to a temporary file, so only one chunk is held in memory here at a time.
+        """
+        try:
+            with Parser(self.filename) as parser:
+                chunks, fmt_def, need_struct_rebuild = self._prepare(parser, executor_type)
+                executor_class = ProcessPoolExecutor if executor_type == "process" else ThreadPoolExecutor
+                total = 0
+
+                if not spool:
+                    for messages in self._run_executor(
+                        executor_class, len(chunks), chunks, fmt_def, message_type, need_struct_rebuild, parent=parser
+                    ):
+                        total += len(messages)
+                        yield from messages
+                        # Drop the spent chunk now rather than when the next one is bound to the loop variable
+                        del messages
+                else:
+                    with tempfile.TemporaryDirectory(prefix="mavlog-") as spool_dir:
+                        for path, chunk_count in self._run_executor(
+                            executor_class, len(chunks), chunks, fmt_def, message_type, need_struct_rebuild,
+                            spool_dir, parser,
+                        ):
+                            with open(path, "rb") as f:
+                                messages = pickle.load(f)
+                            os.remove(path)
+                            total += chunk_count
+                            yield from messages
+                            del messages
+
+            self.logger.info(f"Total messages parsed: {total:,}")
+
+        except Exception as e:
+            self.logger.error(f"Error in parallel processing: {e}")
+            raise RuntimeError(f"Error in parallel processing: {e}") from e
+
+    def _run_columns(
+        self,
+        message_type: Optional[str],
+        executor_type: Literal["process", "thread"],
+        executor: Optional[Executor],
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield each chunk's columns (of every type when message_type is None) in file order."""
+        if executor is not None:
+            executor_type = "thread" if isinstance(executor, ThreadPoolExecutor) else "process"
+
+        with Parser(self.filename) as parser:
+            chunks, fmt_def, need_struct_rebuild = self._prepare(parser, executor_type)
+            if executor is not None:
+                yield from self._run_shared_executor(
+                    executor, chunks, fmt_def, message_type, need_struct_rebuild, parser, columns=True
+                )
+            else:
+                executor_class = ProcessPoolExecutor if executor_type == "process" else ThreadPoolExecutor
+                yield from self._run_executor(
+                    executor_class, len(chunks), chunks, fmt_def, message_type, need_struct_rebuild,
+                    parent=parser, columns=True,
+                )
+
+    def _prepare(
+        self, parser: Parser, executor_type: str
+    ) -> Tuple[List[Tuple[int, int]], Dict[int, Dict[str, Any]], bool]:
+        """Split the opened file into chunks and collect the format definitions to hand to the workers."""
+        chunks = ParallelParser._split_to_chunks(parser, self.max_workers)
+
+        fmt_def = {
+            msg_id: {
+                "Name": fmt["Name"],
+                "Length": fmt["Length"],
+                "Format": fmt["Format"],
+                "Columns": fmt["Columns"],
+            }
+            for msg_id, fmt in parser.format_defs.items()
+        } if executor_type == "process" else parser.format_defs
+
+        need_struct_rebuild = executor_type == "process"
+
+        if not chunks:
+            raise RuntimeError("No chunks to process.")
+
+        self.logger.info(f"Processing {len(chunks)} chunks with {self.max_workers} workers...")
+        return chunks, fmt_def, need_struct_rebuild
+
     def _run_executor(
         self,
         executor_class: Type[ProcessPoolExecutor] | Type[ThreadPoolExecutor],
@@ -74,21 +240,216 @@ class ParallelParser:
         fmt_def: Dict[int, Dict[str, Any]],
         message_type: Optional[str],
         need_struct_rebuild: bool = True,
-    ) -> List[Dict[str, Any]]:
-        """Process chunks using executor and merge results."""
-        with executor_class(max_workers=self.max_workers) as executor:
-            chunk_results = executor.map(
-                ParallelParser._process_chunk,
-                repeat(self.filename, chunks_count),
-                chunks,
-                repeat(fmt_def, chunks_count),
-                repeat(message_type, chunks_count),
-                repeat(need_struct_rebuild, chunks_count),
-            )
+        spool_dir: Optional[str] = None,
+        parent: Optional[Parser] = None,
+        columns: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Yield each chunk's messages (its columns if columns is set, or its (path, count) segment if spooling)
+        in file order as it completes.
+        Chunks are contiguous byte ranges, so submission order is already chronological and needs no merge.
+        Thread workers read the parent's open mmap directly; on POSIX, process workers are forked so they
+        inherit it (and the compiled formats).
+        """
+        executor_kwargs: Dict[str, Any] = {}
+        shared: Optional[Parser] = None
+        run_id: Optional[int] = None
+        if parent is not None and executor_class is ThreadPoolExecutor:
+            shared = parent
+        elif parent is not None and "fork" in multiprocessing.get_all_start_methods():
+            executor_kwargs["mp_context"] = multiprocessing.get_context("fork")
+            run_id = next(_run_ids)
+            _inherited[run_id] = parent
+
+        try:
+            with executor_class(
+                max_workers=self.max_workers,
+                initializer=ParallelParser._init_worker,
+                initargs=(self.filename, fmt_def, need_struct_rebuild, shared, run_id),
+                **executor_kwargs,
+            ) as executor:
+                if columns:
+                    yield from self._map_in_order(
+                        executor,
+                        ParallelParser._process_columns_range,
+                        chunks,
+                        repeat(message_type, chunks_count),
+                    )
+                elif spool_dir is None:
+                    yield from self._map_in_order(
+                        executor,
+                        ParallelParser._process_range,
+                        chunks,
+                        repeat(message_type, chunks_count),
+                    )
+                else:
+                    yield from self._map_in_order(
+                        executor,
+                        ParallelParser._spool_range,
+                        chunks,
+                        repeat(message_type, chunks_count),
+                        repeat(spool_dir, chunks_count),
+                    )
+        finally:
+            if run_id is not None:
+                del _inherited[run_id]
+
+    def _run_shared_executor(
+        self,
+        executor: Executor,
+        chunks: List[Tuple[int, int]],
+        fmt_def: Dict[int, Dict[str, Any]],
+        message_type: Optional[str],
+        need_struct_rebuild: bool,
+        parent: Parser,
+        columns: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Yield each chunk's messages (its columns if columns is set) in file order using a caller-owned executor,
+        which is left running.
+        Its workers were started without our initializer, so each task carries the setup and the run id;
+        for process pools the format definitions are pickled once up front and only unpickled on setup.
+        """
+        format_defs: Dict[int, Dict[str, Any]] | bytes = fmt_def
+        shared: Optional[Parser] = None
+        if isinstance(executor, ThreadPoolExecutor):
+            shared = parent
+        else:
+            format_defs = pickle.dumps(fmt_def, protocol=pickle.HIGHEST_PROTOCOL)
+
+        chunks_count = len(chunks)
+        yield from self._map_in_order(
+            executor,
+            ParallelParser._process_run_range,
+            chunks,
+            repeat(message_type, chunks_count),
+            repeat(self.filename, chunks_count),
+            repeat(format_defs, chunks_count),
+            repeat(need_struct_rebuild, chunks_count),
+            repeat((os.getpid(), next(_run_ids)), chunks_count),
+            repeat(columns, chunks_count),
+            repeat(shared, chunks_count),
+        )
+
+    def _map_in_order(self, executor: Executor, fn: Any, *iterables: Any) -> Iterator[Any]:
+        """
+        Like executor.map, but with at most CHUNKS_IN_FLIGHT tasks per worker submitted ahead of the one being
+        yielded, so results a slow consumer has not reached yet do not pile up in memory.
+        """
+        pending: Deque[Future] = deque()
+        try:
+            for args in zip(*iterables):
+                if len(pending) >= self.max_workers * CHUNKS_IN_FLIGHT:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(fn, *args))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _process_run_range(
+        chunk_range: Tuple[int, int],
+        message_type: Optional[str],
+        filename: str,
+        format_defs: Dict[int, Dict[str, Any]] | bytes,
+        need_struct_rebuild: bool,
+        run_id: Tuple[int, int],
+        columns: bool = False,
+        shared: Optional[Parser] = None,
+    ) -> Any:
+        """Set the worker up on its first chunk of a run (closing the previous run's log), then process the chunk."""
+        if getattr(_worker, "run_id", None) != run_id:
+            previous: Optional[Parser] = getattr(_worker, "parser", None)
+            if previous is not None and previous._file is not None:
+                previous.__exit__(None, None, None)
+            if isinstance(format_defs, bytes):
+                format_defs = pickle.loads(format_defs)
+            ParallelParser._init_worker(filename, format_defs, need_struct_rebuild, shared)
+            _worker.run_id = run_id
+        if columns:
+            return ParallelParser._process_columns_range(chunk_range, message_type)
+        return ParallelParser._process_range(chunk_range, message_type)
+
+    @staticmethod
+    def _init_worker(
+        filename: str,
+        format_defs: Dict[int, Dict[str, Any]],
+        need_struct_rebuild: bool = True,
+        shared: Optional[Parser] = None,
+        run_id: Optional[int] = None,
+    ) -> None:
+        """
+        Open the log and compile format definitions once per worker, for every chunk it processes.
+        A thread worker is handed its run's driver parser as shared; a forked worker finds it in _inherited
+        under run_id.
+        """
+        inherited = _inherited.get(run_id) if run_id is not None else None
+        if inherited is not None and inherited.data is not None:
+            # Forked child: its copy of the driver's parser is private and already has compiled formats
+            _worker.parser = inherited
+            _worker.format_defs = inherited.format_defs.copy()
+            return
+        if shared is not None and shared.data is not None:
+            # Thread worker: own offset and formats over the driver's shared, read-only mapping
+            parser = Parser(filename)
+            parser.data = shared.data
+        else:
+            parser = Parser(filename).__enter__()
+        if need_struct_rebuild:
+            for fmt in format_defs.values():
+                fmt.update(compile_format_def(fmt["Name"], fmt["Length"], fmt["Format"], fmt["Columns"]))
+        parser.format_defs = format_defs
+        _worker.parser = parser
+        _worker.format_defs = format_defs.copy()
+
+    @staticmethod
+    def _process_range(chunk_range: Tuple[int, int], message_type: Optional[str]) -> List[Dict[str, Any]]:
+        """Process a chunk with the worker's already opened parser and return messages."""
+        try:
+            parser: Parser = _worker.parser
+            advise(parser.data, getattr(mmap, "MADV_WILLNEED", None), chunk_range[0], chunk_range[1] - chunk_range[0])
+            # FMTs met in a previous chunk must not carry over, so every chunk starts from the shipped definitions
+            parser.format_defs = _worker.format_defs.copy()
+            parser.offset = chunk_range[0]
+            messages = parser._decode_range(message_type, chunk_range[1], "Decoder")
+            # Unmap the decoded range (the page cache keeps it), so a worker's resident memory does not grow per chunk
+            advise(parser.data, getattr(mmap, "MADV_DONTNEED", None), chunk_range[0], parser.offset - chunk_range[0])
+            return messages
+
+        except Exception as e:
+            raise RuntimeError(f"Error processing chunk {chunk_range}: {e}") from e
+
+    @staticmethod
+    def _process_columns_range(chunk_range: Tuple[int, int], message_type: Optional[str]) -> Dict[str, Any]:
+        """
+        Process a chunk with the worker's already opened parser and return one message type column-wise,
+        or every type (type name -> columns) when message_type is None.
+        """
+        try:
+            parser: Parser = _worker.parser
+            advise(parser.data, getattr(mmap, "MADV_WILLNEED", None), chunk_range[0], chunk_range[1] - chunk_range[0])
+            parser.format_defs = _worker.format_defs.copy()
+            parser.offset = chunk_range[0]
+            if message_type is None:
+                columns: Dict[str, Any] = parser.get_all_columns(chunk_range[1])
+            else:
+                columns = parser.get_columns(message_type, chunk_range[1])
+            advise(parser.data, getattr(mmap, "MADV_DONTNEED", None), chunk_range[0], parser.offset - chunk_range[0])
+            return columns
 
-        results = list(chain.from_iterable(chunk_results))
+        except Exception as e:
+            raise RuntimeError(f"Error processing chunk {chunk_range}: {e}") from e
 
-        return results
+    @staticmethod
+    def _spool_range(chunk_range: Tuple[int, int], message_type: Optional[str], spool_dir: str) -> Tuple[str, int]:
+        """Process a chunk and pickle its messages to a segment file in spool_dir, returning (path, count)."""
+        messages = ParallelParser._process_range(chunk_range, message_type)
+        path = os.path.join(spool_dir, f"part{chunk_range[0]:012d}.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(messages, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path, len(messages)
 
     @staticmethod
     def _process_chunk(
@@ -98,56 +459,132 @@ class ParallelParser:
         message_type: Optional[str],
         need_struct_rebuild: bool = True,
     ) -> List[Dict[str, Any]]:
-        """Process a chunk of the log file and return messages."""
+        """Process a single chunk outside an executor, opening and closing the log just for it."""
         try:
-            if need_struct_rebuild:
-                for fmt in format_defs.values():
-                    fmt["Struct"] = Struct(fmt["StructStr"])
-            with Parser(filename) as parser:
-                parser.format_defs = format_defs
-                parser.offset = chunk_range[0]
-                messages = list(parser.messages(message_type, end_index=chunk_range[1]))
-                return messages
+            ParallelParser._init_worker(filename, format_defs, need_struct_rebuild)
+            try:
+                return ParallelParser._process_range(chunk_range, message_type)
+            finally:
+                _worker.parser.__exit__(None, None, None)
+                del _worker.parser, _worker.format_defs
 
         except Exception as e:
             raise RuntimeError(f"Error processing chunk {chunk_range}: {e}") from e
 
     @staticmethod
     def _split_to_chunks(parser: Parser, max_workers: int) -> List[Tuple[int, int]]:
-        """Split the file into valid message-aligned chunks."""
+        """Split the file into message-aligned chunks, loading FMT definitions first."""
         try:
             if parser.data is None:
                 raise RuntimeError("File must be opened before splitting.")
 
             data = parser.data
-            fmt_defs = parser.format_defs
             size = len(data)
 
             if size == 0:
                 raise RuntimeError("Log file is empty.")
 
-            chunk_size = max(size // max_workers, 10 * 1024 * 1024)
-            chunks, pos = [], 0
-            header_len = len(MSG_HEADER)
-            while True:
-                pos = data.find(MSG_HEADER, pos)
-                if pos == -1:
-                    raise RuntimeError("No valid message headers found in file.")
-                if is_valid_message_header(data, pos, fmt_defs):
-                    break
-                pos += header_len
+            # Walk the head of the log for its FMTs, then pick up any written later by C-level search;
+            # cut points are then found the same way
+            offset, parser.offset = parser.offset, 0
+            parser._decode_range("FMT", min(size, FMT_SCAN_WINDOW), None)
+            ParallelParser._load_late_formats(parser, parser.offset)
+            parser.offset = offset
 
-            while pos < size:
-                start = pos
-                end = min(start + chunk_size, size)
+            chunk_size = max(size // (max_workers * CHUNKS_PER_WORKER), MIN_CHUNK_SIZE)
+            chunk_size = -(-chunk_size // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT
 
-                next_pos = data.find(MSG_HEADER, end)
-                while next_pos != -1 and not is_valid_message_header(data, next_pos, fmt_defs):
-                    next_pos = data.find(MSG_HEADER, next_pos + header_len)
+            lengths = ParallelParser._length_table(parser.format_defs)
+            # The serial walk resyncs by itself, so only interior cuts need a validated chain; the first chunk
+            # starts at the first header, keeping leading FMTs and any messages around a corrupt early byte
+            start = data.find(MSG_HEADER)
+            if start == -1:
+                raise RuntimeError("No valid message headers found in file.")
 
-                pos = next_pos if next_pos != -1 else size
-                chunks.append((start, pos))
+            chunks: List[Tuple[int, int]] = []
+            target = (start // chunk_size + 1) * chunk_size
+            while target < size:
+                cut = ParallelParser._find_boundary(data, target, lengths)
+                if cut == -1:
+                    break
+                chunks.append((start, cut))
+                start, target = cut, (cut // chunk_size + 1) * chunk_size
+            chunks.append((start, size))
 
             return chunks
         except Exception as e:
             raise RuntimeError(f"Error splitting to chunks: {e}") from e
+
+    @staticmethod
+    def _load_late_formats(parser: Parser, pos: int) -> None:
+        """
+        Register the FMT messages at or after pos, found by header search instead of a walk over every message.
+        One that parses but does not start a valid chain of messages cannot be told apart from payload bytes,
+        so the definitions found so far are dropped and the rest of the log is walked for its FMTs as before.
+        """
+        data = parser.data
+        marker = MSG_HEADER + bytes([FORMAT_MSG_TYPE])
+        lengths = ParallelParser._length_table(parser.format_defs)
+        walk_from, walked_defs = pos, dict(parser.format_defs)
+
+        while True:
+            pos = data.find(marker, pos)
+            if pos == -1:
+                return
+            try:
+                fields = parser._read_format_def(pos)
+            except struct.error:
+                fields = None
+            if fields is None or not set(fields[3]) <= FORMAT_MAPPING.keys():
+                pos += 1
+                continue
+
+            msg_type, length = fields[0], fields[2]
+            lengths[msg_type] = length
+            if not ParallelParser._chains(data, pos, lengths) or not parser._extract_format_def(pos):
+                parser.format_defs.clear()
+                parser.format_defs.update(walked_defs)
+                parser.offset = walk_from
+                parser._decode_range("FMT", None, None)
+                return
+            pos += FORMAT_MSG_LENGTH
+
+    @staticmethod
+    def _length_table(fmt_defs: Dict[int, Dict[str, Any]]) -> List[int]:
+        """Message length by id byte (FMT included), 0 for ids without a format, so each chain step is one index."""
+        lengths = [0] * 256
+        for msg_id, fmt in fmt_defs.items():
+            lengths[msg_id] = fmt["Length"]
+        lengths[FORMAT_MSG_TYPE] = FORMAT_MSG_LENGTH
+        return lengths
+
+    @staticmethod
+    def _find_boundary(data: mmap.mmap, pos: int, lengths: List[int]) -> int:
+        """
+        Return the first header at or after pos that starts a chain of BOUNDARY_CHAIN messages, each stepping by
+        its length from the _length_table onto another header (or to the end of the file), or -1 if there is none.
+        """
+        find = data.find
+        chains = ParallelParser._chains
+
+        while True:
+            pos = find(MSG_HEADER, pos)
+            if pos == -1 or chains(data, pos, lengths):
+                return pos
+            pos += 1
+
+    @staticmethod
+    def _chains(data: mmap.mmap, position: int, lengths: List[int]) -> bool:
+        """Return whether BOUNDARY_CHAIN messages chain from position, each stepping onto a header or to the end."""
+        size = len(data)
+        header_0, header_1 = MSG_HEADER
+        for _ in range(BOUNDARY_CHAIN):
+            if position >= size - 2:
+                return True
+            if data[position] != header_0 or data[position + 1] != header_1:
+                return False
+            length = lengths[data[position + 2]]
+            if not length:
+                return False
+            position += length
+        return True
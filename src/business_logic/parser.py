@@ -3,21 +3,27 @@
 import mmap
 import os
 import struct
-from typing import Any, Dict, Iterator, List, Optional, Type
+import sys
+from collections import defaultdict, namedtuple
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Type
 
 from src.utils.constants import (
-    BYTES_FIELDS,
     FMT_STRUCT,
-    FORMAT_MAPPING,
     FORMAT_MSG_LENGTH,
     FORMAT_MSG_TYPE,
-    LATITUDE_LONGITUDE_FORMAT,
     MSG_HEADER,
-    SCALE_FACTOR_FIELDS,
 )
-from src.utils.helpers import bytes_to_ascii
+from src.utils.helpers import advise, bytes_to_ascii, compile_format_def, extend_columns, fadvise, gc_paused
 from src.utils.logger import setup_logger
 
+# Bytes of log decoded per batch while a messages()/records() generator is being consumed
+DECODE_WINDOW = 64 * 1024
+
+# FMT message layout, compiled once for every FMT read (including candidates checked by the parallel split)
+FMT_LAYOUT = struct.Struct(FMT_STRUCT)
+
+FmtRecord = namedtuple("FMT", ["mavpackettype", "Type", "Name", "Length", "Format", "Columns"])
+
 
 class Parser:
     """
@@ -41,7 +47,10 @@ class Parser:
             if file_size == 0:
                 raise RuntimeError("Empty MAVLink log file")
             else:
+                fadvise(self._file.fileno(), getattr(os, "POSIX_FADV_SEQUENTIAL", None))
                 self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                advise(self.data, getattr(mmap, "MADV_SEQUENTIAL", None))
+                advise(self.data, getattr(mmap, "MADV_WILLNEED", None))
             self.logger.info(f"Opened file: {self.filename}")
             return self
         except Exception as e:
@@ -68,77 +77,282 @@ class Parser:
         """
         Generator yielding MAVLink messages as dictionaries.
         """
+        return self._iter_messages(message_type, end_index, "Decoder")
+
+    def records(self, message_type: Optional[str] = None, end_index: Optional[int] = None) -> Iterator[NamedTuple]:
+        """
+        Generator yielding MAVLink messages as per-format namedtuples (use ._asdict() for a dict).
+        """
+        return self._iter_messages(message_type, end_index, "RecordDecoder")
+
+    def message_batches(
+        self, message_type: Optional[str] = None, end_index: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Generator yielding MAVLink messages as dictionaries, a decoded window (non-empty list) at a time.
+        """
+        return self._iter_batches(message_type, end_index, "Decoder")
+
+    def _iter_messages(
+        self, message_type: Optional[str], end_index: Optional[int], decoder: Optional[str]
+    ) -> Iterator[Any]:
+        """Walk the log yielding messages built by the named format decoder, or raw unpacked tuples if None."""
+        for messages in self._iter_batches(message_type, end_index, decoder):
+            yield from messages
+
+    def _iter_batches(
+        self, message_type: Optional[str], end_index: Optional[int], decoder: Optional[str]
+    ) -> Iterator[List[Any]]:
+        """Walk the log yielding the messages of each DECODE_WINDOW as one list, skipping windows with none."""
         if self.data is None:
             raise RuntimeError("Parser not initialized. Use 'with MavlogParser(...) as parser:'")
 
         data_len: int = len(self.data)
-        while (self.offset < data_len) and ((not end_index) or (self.offset < end_index)):
-            position: int = self.data.find(MSG_HEADER, self.offset)
-            if position == -1:
+        end: int = data_len if end_index is None else min(end_index, data_len)
+
+        # Decode a window at a time in _decode_range and hand its list out whole
+        dontneed: Optional[int] = getattr(mmap, "MADV_DONTNEED", None)
+        while self.offset < end:
+            start: int = self.offset
+            messages: List[Any] = self._decode_range(message_type, min(start + DECODE_WINDOW, end), decoder)
+            # The window is decoded, so unmap its pages (they stay in the page cache) to keep resident memory flat
+            advise(self.data, dontneed, start, self.offset - start)
+            if messages:
+                yield messages
+            if self.offset == start:
                 break
 
+    def _decode_range(
+        self,
+        message_type: Optional[str],
+        end_index: Optional[int],
+        decoder: Optional[str],
+        segments: Optional[List[Tuple[Dict[str, Any], List[tuple]]]] = None,
+    ) -> List[Any]:
+        """
+        Decode every message starting before end_index into a list, advancing self.offset past them.
+        Same output as _iter_messages, but builds the list directly (runs are extended in one C call).
+        With segments, raw unpacked tuples are instead gathered per message id and appended to it as
+        (format, rows) pairs, split wherever an FMT changes an id's definition; the returned list stays empty.
+        """
+        if self.data is None:
+            raise RuntimeError("Parser not initialized. Use 'with MavlogParser(...) as parser:'")
+
+        data: mmap.mmap = self.data
+        find = data.find
+        header: bytes = MSG_HEADER
+        header_0, header_1 = header
+        fmt_msg_type: int = FORMAT_MSG_TYPE
+        fmt_msg_length: int = FORMAT_MSG_LENGTH
+        data_len: int = len(data)
+        end: int = data_len if end_index is None else min(end_index, data_len)
+
+        # Filtered walks step over other known types by id alone, without touching their format dicts
+        skip_lengths: List[int] = self._skip_lengths(message_type) if message_type else []
+        # Everything the walk decodes is looked up by id byte in one list, not in the format dict per message
+        formats: List[Optional[tuple]] = self._dispatch_table(message_type, decoder)
+
+        messages: List[Any] = []
+        append = messages.append
+        extend = messages.extend
+        rows: Optional[Dict[int, List[tuple]]] = None if segments is None else defaultdict(list)
+
+        offset: int = self.offset
+        while offset < end:
+            position: int = offset
             try:
-                message_id: int = self.data[position + 2]
-                if message_id == FORMAT_MSG_TYPE:
-                    format_defs: Optional[Dict[str, Any]] = self._extract_format_def(position)
-                    self.offset = position + (FORMAT_MSG_LENGTH if format_defs else 1)
-                    if format_defs and (message_type in (None, "FMT")):
-                        yield format_defs
-                    continue
+                if data[position] != header_0 or data[position + 1] != header_1:
+                    position = find(header, position, end + 1)
+                    if position == -1:
+                        # No header starts before end, so the next one is at end or later
+                        offset = max(offset, end - 1)
+                        break
 
-                msg_format: Optional[Dict[str, Any]] = self.format_defs.get(message_id)
-                if not msg_format:
-                    self.offset = position + 1
+                message_id: int = data[position + 2]
+                if skip_lengths:
+                    length = skip_lengths[message_id]
+                    if length:
+                        offset = position + length
+                        continue
+
+                if message_id == fmt_msg_type:
+                    previous: Optional[Dict[str, Any]] = None
+                    if rows is not None and position + 3 < data_len:
+                        previous = self.format_defs.get(data[position + 3])
+                    format_defs: Optional[Dict[str, Any]] = self._extract_format_def(position)
+                    offset = position + (fmt_msg_length if format_defs else 1)
+                    if format_defs and format_defs["Type"] != fmt_msg_type:
+                        # Only the (re)defined id changes, so patch its slots instead of rebuilding the tables
+                        msg_format = self.format_defs[format_defs["Type"]]
+                        decoded = not message_type or msg_format["Name"] == message_type
+                        formats[format_defs["Type"]] = self._dispatch_entry(msg_format, decoder) if decoded else None
+                        if message_type:
+                            skip_lengths[format_defs["Type"]] = 0 if decoded else msg_format["Length"]
+                        if (
+                            rows is not None
+                            and previous is not None
+                            and format_defs["Type"] in rows
+                            and (previous["Name"], previous["Format"], previous["Columns"])
+                            != (msg_format["Name"], msg_format["Format"], msg_format["Columns"])
+                        ):
+                            # Rows gathered so far belong to the old definition, so they are set aside with it
+                            segments.append((previous, rows.pop(format_defs["Type"])))
+                    if decoder and format_defs and (message_type in (None, "FMT")):
+                        append(format_defs if decoder == "Decoder" else FmtRecord(**format_defs))
                     continue
 
-                if message_type and msg_format["Name"] != message_type:
-                    self.offset = position + msg_format["Length"]
+                entry: Optional[tuple] = formats[message_id]
+                if entry is None:
+                    offset = position + 1
                     continue
 
-                message_end: int = position + msg_format["Length"]
+                length, unpack_from, record, decode = entry
+                message_end: int = position + length
                 if message_end > data_len:
                     break
 
-                unpacked: tuple = msg_format["Struct"].unpack_from(self.data, position + 3)
-                message: Dict[str, Any] = self._decode_messages(msg_format["Name"], msg_format, unpacked)
+                run_end: int = message_end
+                if record is not None:
+                    # Compare the next header and id byte by byte in place, without slicing a copy out of the map
+                    while (
+                        run_end < end
+                        and run_end + length <= data_len
+                        and data[run_end] == header_0
+                        and data[run_end + 1] == header_1
+                        and data[run_end + 2] == message_id
+                    ):
+                        run_end += length
+
+                if run_end == message_end:
+                    unpacked: tuple = unpack_from(data, position + 3)
+                    if rows is None:
+                        append(decode(unpacked) if decode else unpacked)
+                    else:
+                        rows[message_id].append(unpacked)
+                    offset = message_end
+                    continue
 
-                yield message
-                self.offset = message_end
+                records = record.iter_unpack(data[position:run_end])
+                if rows is None:
+                    extend(map(decode, records) if decode else records)
+                else:
+                    rows[message_id].extend(records)
+                offset = run_end
             except IndexError:
                 break
             except Exception as e:
                 self.logger.error(f"Error parsing message at offset {position}: {e}")
-                self.offset = position + 1
+                offset = position + 1
                 continue
 
+        self.offset = offset
+        if rows is not None:
+            segments.extend((self.format_defs[msg_id], id_rows) for msg_id, id_rows in rows.items())
+        return messages
+
+    def _skip_lengths(self, message_type: str) -> List[int]:
+        """Length by id byte of every known message not named message_type (FMT excluded), 0 for the rest."""
+        lengths = [0] * 256
+        for msg_id, fmt in self.format_defs.items():
+            if fmt["Name"] != message_type and msg_id != FORMAT_MSG_TYPE:
+                lengths[msg_id] = fmt["Length"]
+        return lengths
+
+    def _dispatch_table(self, message_type: Optional[str], decoder: Optional[str]) -> List[Optional[tuple]]:
+        """Dispatch entry by id byte of every known message the walk decodes (FMT excluded), None for the rest."""
+        formats: List[Optional[tuple]] = [None] * 256
+        for msg_id, fmt in self.format_defs.items():
+            if msg_id != FORMAT_MSG_TYPE and (not message_type or fmt["Name"] == message_type):
+                formats[msg_id] = self._dispatch_entry(fmt, decoder)
+        return formats
+
+    @staticmethod
+    def _dispatch_entry(fmt: Dict[str, Any], decoder: Optional[str]) -> tuple:
+        """(length, unpack_from, run Struct or None, decoder or None) of one compiled format."""
+        return fmt["Length"], fmt["Struct"].unpack_from, fmt["Record"], fmt[decoder] if decoder else None
+
     def get_all_messages(self, message_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """Return all messages of the specified type (or all messages if None)."""
-        return list(self.messages(message_type))
+        return self._decode_range(message_type, None, "Decoder")
+
+    def get_all_records(self, message_type: Optional[str] = None) -> List[NamedTuple]:
+        """
+        Return all messages of the specified type (or all messages if None) as per-format namedtuples.
+        Unlike message dicts, namedtuples stay GC-tracked, so the decode runs with collection paused as get_columns does.
+        """
+        with gc_paused():
+            return self._decode_range(message_type, None, "RecordDecoder")
+
+    def get_columns(self, message_type: str, end_index: Optional[int] = None) -> Dict[str, List[Any]]:
+        """
+        Return all messages of one type column-wise (column name -> list of values).
+        Records are unpacked without building a dict per message and converted a column at a time.
+        """
+        segments: List[Tuple[Dict[str, Any], List[tuple]]] = []
+        with gc_paused():
+            self._decode_range(message_type, end_index, None, segments)
+            return self._columns_from_segments(segments).get(message_type, {})
+
+    def _read_format_def(self, position: int) -> Optional[Tuple[int, str, int, str, List[str]]]:
+        """Unpack the FMT message at position into (type, name, length, format, columns), or None if it is unusable."""
+        if self.data is None:
+            raise RuntimeError("Parser not initialized. Use 'with Parser(...) as parser:'")
+        _, _, msg_type, length, name_bin, format_def_bin, columns_bin = FMT_LAYOUT.unpack_from(self.data, position)
+        name: str = sys.intern(bytes_to_ascii(name_bin))
+        format_def: str = bytes_to_ascii(format_def_bin)
+        # Interned, so column-wise results and callers' literal keys share one str per column name
+        cols: List[str] = [
+            sys.intern(c)
+            for c in map(str.strip, columns_bin.split(b"\x00", 1)[0].decode("ascii", "ignore").split(","))
+            if c
+        ]
+
+        # A length that cannot cover the 3-byte header would never advance the walk
+        if not (name and format_def and cols) or length < 3:
+            return None
+        return msg_type, name, length, format_def, cols
+
+    def get_all_columns(self, end_index: Optional[int] = None) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Return every message type column-wise (type name -> column name -> list of values) from a single walk.
+        Records are gathered as raw tuples per message id and converted a column at a time, as get_columns does.
+        """
+        segments: List[Tuple[Dict[str, Any], List[tuple]]] = []
+        with gc_paused():
+            self._decode_range(None, end_index, None, segments)
+            return self._columns_from_segments(segments)
+
+    @staticmethod
+    def _columns_from_segments(
+        segments: List[Tuple[Dict[str, Any], List[tuple]]]
+    ) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Convert (format, rows) segments into type name -> columns, each with the definition its rows were read under.
+        Segments of one name are joined by extend_columns; they are consumed as they go, so raw tuples and columns
+        never all coexist.
+        """
+        tables: Dict[str, Dict[str, List[Any]]] = {}
+        segments.reverse()
+        while segments:
+            fmt, rows = segments.pop()
+            columns = fmt["ColumnDecoder"](rows)
+            del rows
+            table = tables.get(fmt["Name"])
+            if table is None:
+                tables[fmt["Name"]] = columns
+            else:
+                extend_columns(table, columns)
+        return tables
 
     def _extract_format_def(self, position: int) -> Optional[Dict[str, Any]]:
         """Parse and store an FMT (Format Definition) message."""
         try:
-            if self.data is None:
-                raise RuntimeError("Parser not initialized. Use 'with Parser(...) as parser:'")
-            _, _, msg_type, length, name_bin, format_def_bin, columns_bin = struct.unpack_from(
-                FMT_STRUCT, self.data, position
-            )
-            name: str = bytes_to_ascii(name_bin)
-            format_def: str = bytes_to_ascii(format_def_bin)
-            cols: List[str] = [
-                c.strip() for c in columns_bin.split(b"\x00", 1)[0].decode("ascii", "ignore").split(",") if c.strip()
-            ]
-
-            if not (name and format_def and cols):
+            fields = self._read_format_def(position)
+            if fields is None:
                 return None
+            msg_type, name, length, format_def, cols = fields
 
-            format_defs = {
-                "Name": name,
-                "Length": length,
-                "Format": format_def,
-                "Columns": cols,
-                "Struct": struct.Struct("<" + "".join(map(FORMAT_MAPPING.__getitem__, format_def)))
-            }
+            format_defs = compile_format_def(name, length, format_def, cols)
 
             self.format_defs[msg_type] = format_defs
 
@@ -154,23 +368,3 @@ class Parser:
         except Exception as e:
             self.logger.error(f"Error parsing FMT at offset {position}: {e}")
             return None
-
-    @staticmethod
-    def _decode_messages(msg_type: str, format_defs: dict, unpacked: tuple) -> dict:
-        """Decode fields according to format definition."""
-        decoded: Dict[str, Any] = {"mavpackettype": msg_type}
-        for fmt, col, val in zip(format_defs["Format"], format_defs["Columns"], unpacked):
-            try:
-                if isinstance(val, bytes):
-                    decoded[col] = (
-                        val if (fmt == "Z" and col in BYTES_FIELDS) else val.rstrip(b"\x00").decode("ascii", "ignore")
-                    )
-                elif fmt in SCALE_FACTOR_FIELDS:
-                    decoded[col] = val / 100.0
-                elif fmt == LATITUDE_LONGITUDE_FORMAT:
-                    decoded[col] = val / 1e7
-                else:
-                    decoded[col] = val
-            except Exception:
-                decoded[col] = None
-        return decoded
@@ -1,23 +1,240 @@
+import gc
 import mmap
-from typing import Any, Dict
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from keyword import iskeyword
+from operator import attrgetter, itemgetter, le
+from struct import Struct
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from src.utils.constants import FORMAT_MSG_TYPE, MSG_HEADER
+from src.utils.constants import BYTES_FIELDS, FIELD_DIVISORS, FORMAT_MAPPING, FORMAT_MAPPING_TR
 
 
-def is_valid_message_header(data: bytes | mmap.mmap, pos: int, fmt_defs: Dict[int, Dict[str, Any]]) -> bool:
-    """Check if MSG_HEADER at pos marks a valid message start."""
-    if pos + 2 >= len(data) or data[pos : pos + 2] != MSG_HEADER:
-        return False
+def advise(data: mmap.mmap, option: Optional[int], start: int = 0, length: Optional[int] = None) -> None:
+    """Give the kernel an access-pattern hint for a range of the mapping; a no-op where madvise is unsupported."""
+    if option is None:
+        return
+    aligned_start = start - start % mmap.PAGESIZE
+    try:
+        if length is None:
+            data.madvise(option, aligned_start)
+        else:
+            data.madvise(option, aligned_start, length + start - aligned_start)
+    except (AttributeError, OSError, ValueError):
+        pass
 
-    msg_id = data[pos + 2]
-    if msg_id == FORMAT_MSG_TYPE:
-        return True
 
-    fmt = fmt_defs.get(msg_id)
-    return bool(fmt and pos + fmt["Length"] <= len(data))
+def fadvise(fd: int, option: Optional[int], start: int = 0, length: int = 0) -> None:
+    """Give the kernel a page-cache hint for a range of an open file (length 0 = to EOF); a no-op where unsupported."""
+    if option is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, start, length, option)
+    except OSError:
+        pass
 
 
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """
+    Suspend cyclic garbage collection for the block, restoring its previous state after.
+    Unpacked tuples are GC-tracked containers, so bulk-decoding millions of them keeps triggering full collections
+    that re-scan every row gathered so far, although rows of plain values can never form a cycle.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# Short text fields (n/N) hold identifiers such as parameter names, repeated across many messages; the 64-byte
+# Z fields are mostly free text, where a lookup would only add a miss per value
+CACHED_TEXT_FORMATS = frozenset("nN")
+
+# Bound on the decoded-text cache, which is simply emptied when full
+TEXT_CACHE_SIZE = 4096
+
+_text_cache: Dict[bytes, str] = {}
+
+
+def decode_text(raw: bytes) -> str:
+    """Decode a NUL-padded text field, reusing one str per distinct raw value."""
+    text = _text_cache.get(raw)
+    if text is None:
+        if len(_text_cache) >= TEXT_CACHE_SIZE:
+            _text_cache.clear()
+        text = _text_cache[raw] = raw.rstrip(b"\x00").decode("ascii", "ignore")
+    return text
+
+
+@lru_cache(maxsize=1024)
 def bytes_to_ascii(bytes_data: bytes) -> str:
-    """Convert null-terminated bytes to ASCII string."""
-    null = bytes_data.find(0)
-    return bytes_data[: null if null != -1 else None].decode("ascii", "ignore").strip()
+    """Convert null-terminated bytes to ASCII string (cached, FMT fields repeat across re-emitted FMTs)."""
+    return bytes_data.split(b"\x00", 1)[0].decode("ascii", "ignore").strip()
+
+
+@lru_cache(maxsize=None)
+def compile_struct(format_def: str) -> Struct:
+    """Return the compiled little-endian Struct for a FMT format string (cached per process)."""
+    unknown = set(format_def).difference(FORMAT_MAPPING)
+    if unknown:
+        raise KeyError(f"Unknown format characters: {''.join(sorted(unknown))}")
+    return Struct("<" + format_def.translate(FORMAT_MAPPING_TR))
+
+
+@lru_cache(maxsize=None)
+def compile_record_struct(format_def: str, length: int) -> Optional[Struct]:
+    """
+    Return a Struct covering a whole message (header, id and body) of the given length,
+    so runs of consecutive same-type messages can be unpacked with iter_unpack.
+    """
+    padding = length - 3 - compile_struct(format_def).size
+    if padding < 0:
+        return None
+    return Struct(f"<3x{compile_struct(format_def).format[1:]}{padding}x")
+
+
+@lru_cache(maxsize=None)
+def compile_decoder(
+    name: str, format_def: str, columns: Tuple[str, ...], as_record: bool = False
+) -> Callable[[tuple], Any]:
+    """
+    Generate a decoder for one FMT definition that turns an unpacked tuple into a message dict,
+    or into a per-format namedtuple when as_record is set.
+    Field conversions are resolved once here, so decoding a message is a single literal/constructor call.
+    """
+    layout = compile_struct(format_def)
+    sample = layout.unpack(bytes(layout.size))
+    names, values = ["mavpackettype"], [repr(name)]
+    for index, (fmt, col, val) in enumerate(zip(format_def, columns, sample)):
+        value = f"u[{index}]"
+        if isinstance(val, bytes):
+            if fmt in CACHED_TEXT_FORMATS:
+                value = f"text({value})"
+            elif not (fmt == "Z" and col in BYTES_FIELDS):
+                value = f"{value}.rstrip(b'\\x00').decode('ascii', 'ignore')"
+        elif fmt in FIELD_DIVISORS:
+            value = f"{value} / {FIELD_DIVISORS[fmt]!r}"
+        names.append(col)
+        values.append(value)
+
+    namespace: Dict[str, Any] = {"text": decode_text}
+    if as_record:
+        typename = name if name.isidentifier() and not iskeyword(name) else "Message"
+        namespace.update(Row=namedtuple(typename, names, rename=True), new=tuple.__new__)
+        body = f"new(Row, ({', '.join(values)},))"
+    else:
+        body = "{" + ", ".join(f"{col!r}: {value}" for col, value in zip(names, values)) + "}"
+    exec(f"def decode(u):\n    return {body}\n", namespace)
+    return namespace["decode"]
+
+
+@lru_cache(maxsize=None)
+def compile_column_decoder(format_def: str, columns: Tuple[str, ...]) -> Callable[[List[tuple]], Dict[str, List[Any]]]:
+    """
+    Build a decoder that turns a list of unpacked tuples of one format into per-column lists,
+    applying the same conversions as compile_decoder once per column instead of once per field.
+    """
+    layout = compile_struct(format_def)
+    sample = layout.unpack(bytes(layout.size))
+    converters: List[Tuple[str, Callable[[List[tuple]], List[Any]]]] = []
+    for index, (fmt, col, val) in enumerate(zip(format_def, columns, sample)):
+        # Each column is pulled out of the rows by a C-level itemgetter map rather than transposing with zip(*rows)
+        field = itemgetter(index)
+        if isinstance(val, bytes):
+            if fmt == "Z" and col in BYTES_FIELDS:
+                converters.append((col, lambda rows, field=field: list(map(field, rows))))
+            elif fmt in CACHED_TEXT_FORMATS:
+                converters.append((col, lambda rows, field=field: list(map(decode_text, map(field, rows)))))
+            else:
+                converters.append(
+                    (col, lambda rows, field=field: [v.rstrip(b"\x00").decode("ascii", "ignore") for v in map(field, rows)])
+                )
+        elif fmt in FIELD_DIVISORS:
+            converters.append(
+                (col, lambda rows, field=field, divisor=FIELD_DIVISORS[fmt]: [v / divisor for v in map(field, rows)])
+            )
+        else:
+            converters.append((col, lambda rows, field=field: list(map(field, rows))))
+
+    def decode_columns(rows: List[tuple]) -> Dict[str, List[Any]]:
+        return {col: convert(rows) for col, convert in converters}
+
+    return decode_columns
+
+
+def extend_columns(table: Dict[str, List[Any]], columns: Dict[str, List[Any]]) -> None:
+    """
+    Append one column-wise batch of a message type to another in place. A column only one side has
+    (the type was redefined with other fields) is padded with None, so every column keeps one value per row.
+    """
+    before = len(next(iter(table.values()), ()))
+    added = len(next(iter(columns.values()), ()))
+    for col, values in table.items():
+        if col not in columns:
+            values.extend([None] * added)
+    for col, values in columns.items():
+        existing = table.get(col)
+        if existing is None:
+            table[col] = [None] * before + values
+        else:
+            existing.extend(values)
+
+
+def compile_format_def(name: str, length: int, format_def: str, columns: List[str]) -> Dict[str, Any]:
+    """Build a format definition entry with all compiled helpers used by the parser."""
+    cols = tuple(columns)
+    return {
+        "Name": name,
+        "Length": length,
+        "Format": format_def,
+        "Columns": columns,
+        "Struct": compile_struct(format_def),
+        "Decoder": compile_decoder(name, format_def, cols),
+        "RecordDecoder": compile_decoder(name, format_def, cols, as_record=True),
+        "Record": compile_record_struct(format_def, length),
+        "ColumnDecoder": compile_column_decoder(format_def, cols),
+    }
+
+
+def sort_by_time(messages: List[Any]) -> List[Any]:
+    """
+    Sort messages in place by TimeUS and return the list; messages without it (e.g. FMT) sort as time 0.
+    Parser output is already in file (write) order, so only call this when a strict global time order is needed.
+    Timsort merges the already ordered stretches in near-linear time, and sorting in place avoids a second list.
+    Keys come from a C-level attrgetter/itemgetter, falling back to the per-message lambda only for untimed messages.
+    """
+    if messages and not isinstance(messages[0], dict):
+        try:
+            messages.sort(key=attrgetter("TimeUS"))
+        except AttributeError:
+            # list.sort computes every key before moving anything, so a failed attempt leaves the order as it was
+            messages.sort(key=lambda msg: getattr(msg, "TimeUS", 0))
+        return messages
+    try:
+        messages.sort(key=itemgetter("TimeUS"))
+    except KeyError:
+        messages.sort(key=lambda msg: msg.get("TimeUS", 0))
+    return messages
+
+
+def sort_columns_by_time(columns: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """
+    Sort column-wise messages (get_columns / process_columns output) in place by their TimeUS column.
+    The row order is computed once as a stable argsort of the time column, then every column is gathered through it,
+    so no per-row dict or tuple is built; columns without TimeUS, or already in time order, are left as they are.
+    """
+    times = columns.get("TimeUS")
+    # One type's TimeUS is normally already monotonic, which a C-level pairwise check confirms without the gather
+    if not times or all(map(le, times, islice(times, 1, None))):
+        return columns
+    order = sorted(range(len(times)), key=times.__getitem__)
+    for values in columns.values():
+        values[:] = map(values.__getitem__, order)
+    return columns
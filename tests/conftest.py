@@ -1,6 +1,8 @@
+import os
 import struct
 import pytest
 import json
+from pathlib import Path
 
 from src.utils.constants import (
     MSG_HEADER, FORMAT_MSG_TYPE, FORMAT_MSG_LENGTH, FORMAT_MAPPING,
@@ -12,8 +14,10 @@ from src.business_logic.mavlink import Mavlink
 
 @pytest.fixture()
 def log_file_path():
-    """Load log path once per module."""
-    with open("config.json", "r") as f:
+    """Log path from the LOG_FILE_PATH environment variable, else config.json in the project root."""
+    if os.environ.get("LOG_FILE_PATH"):
+        return os.environ["LOG_FILE_PATH"]
+    with open(Path(__file__).resolve().parent.parent / "config.json", "r") as f:
         return json.load(f)["LOG_FILE_PATH"]
 
 
@@ -1,10 +1,11 @@
+import os
 import pytest
 import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from src.business_logic.parser import Parser
-from src.business_logic.parallel import ParallelParser
-from src.utils.helpers import is_valid_message_header
-from src.utils.constants import FORMAT_MAPPING
+from src.business_logic import parallel
+from src.business_logic.parallel import ParallelParser, _worker
 
 
 def test_initialization_custom_workers():
@@ -86,34 +87,33 @@ def test_split_to_chunks_no_headers(corrupted_log_file):
         with pytest.raises(RuntimeError, match="No valid message headers"):
             ParallelParser._split_to_chunks(parser, max_workers=2)
 
-def test_is_valid_message_header():
-    """Test validating message headers."""
-    # Create mock data with header
-    data = b"\xa3\x95\x01" + b"\x00" * 100
-    format_defs = {
-        1: {"Length": 10}
-    }
-
-    assert is_valid_message_header(data, 0, format_defs)
-
-    assert not is_valid_message_header(data, 99, format_defs)
-
-    bad_data = b"\x00\x00\x01" + b"\x00" * 100
-    assert not is_valid_message_header(bad_data, 0, format_defs)
-
-def test_is_valid_message_header_fmt():
-    """Test validating FMT message headers."""
-    data = b"\xa3\x95\x80" + b"\x00" * 100  # 128 = FORMAT_MSG_TYPE
-    format_defs = {}
-
-    assert is_valid_message_header(data, 0, format_defs)
+def test_split_to_chunks_loads_format_defs(valid_log_file):
+    """Test that splitting walks the FMT messages itself and starts on a message header."""
+    with Parser(valid_log_file) as parser:
+        chunks = ParallelParser._split_to_chunks(parser, max_workers=2)
 
-def test_is_valid_message_header_unknown_type():
-    """Test validating headers with unknown message type."""
-    data = b"\xa3\x95\xFF" + b"\x00" * 100
-    format_defs = {}
+        assert [fmt["Name"] for fmt in parser.format_defs.values()] == ["TEST"]
+        assert parser.data[chunks[0][0] : chunks[0][0] + 2] == b"\xa3\x95"
+        assert chunks[-1][1] == len(parser.data)
 
-    assert not is_valid_message_header(data, 0, format_defs)
+@pytest.mark.parametrize("executor_type", ["process", "thread"])
+def test_process_all_keeps_messages_before_corrupt_byte(tmp_path, sample_fmt_message, sample_data_message, executor_type):
+    """Test that garbage among the first messages does not drop the leading FMT and data messages."""
+    log_file = tmp_path / "early_garbage.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(sample_data_message * 3)
+        f.write(b"\xa3\x95\x07")
+        f.write(sample_data_message * 2)
+        f.write(b"\x01")
+        f.write(sample_data_message * 20)
+
+    with Parser(str(log_file)) as parser:
+        expected = parser.get_all_messages()
+        assert ParallelParser._split_to_chunks(parser, max_workers=3)[0][0] == 0
+    results = ParallelParser(str(log_file), max_workers=3).process_all(None, executor_type)
+    assert results == expected
+    assert results[0]["mavpackettype"] == "FMT"
 
 def test_process_chunk_basic(valid_log_file):
     """Test processing a single chunk."""
@@ -129,7 +129,6 @@ def test_process_chunk_basic(valid_log_file):
             "Length": fmt["Length"],
             "Format": fmt["Format"],
             "Columns": fmt["Columns"],
-            "StructStr": "<" + "".join(FORMAT_MAPPING[c] for c in fmt["Format"])
         }
 
     messages = ParallelParser._process_chunk(
@@ -157,7 +156,6 @@ def test_process_chunk_with_filter(valid_log_file):
             "Length": fmt["Length"],
             "Format": fmt["Format"],
             "Columns": fmt["Columns"],
-            "StructStr": "<" + "".join(FORMAT_MAPPING[c] for c in fmt["Format"])
         }
 
     messages = ParallelParser._process_chunk(
@@ -195,7 +193,6 @@ def test_struct_rebuild(valid_log_file):
                 "Length": fmt["Length"],
                 "Format": fmt["Format"],
                 "Columns": fmt["Columns"],
-                "StructStr": "<" + "".join(FORMAT_MAPPING[c] for c in fmt["Format"])
             }
 
         messages = ParallelParser._process_chunk(
@@ -233,4 +230,215 @@ def test_large_file_chunking(tmp_path):
     parallel_parser = ParallelParser(str(log_file), max_workers=4)
     messages = parallel_parser.process_all()
 
-    assert len(messages) >= 1000
\ No newline at end of file
+    assert len(messages) >= 1000
+
+
+def test_worker_reuses_parser_across_ranges(valid_log_file):
+    """Test that one initialized worker parses consecutive ranges like a single pass."""
+    with Parser(valid_log_file) as parser:
+        expected = list(parser.messages())
+        chunks = ParallelParser._split_to_chunks(parser, max_workers=1)
+        format_defs = parser.format_defs
+        size = len(parser.data)
+
+    ParallelParser._init_worker(valid_log_file, format_defs, need_struct_rebuild=False)
+    try:
+        middle = chunks[0][0] + 89
+        first = ParallelParser._process_range((0, middle), None)
+        second = ParallelParser._process_range((middle, size), None)
+    finally:
+        _worker.parser.__exit__(None, None, None)
+        del _worker.parser
+
+    assert first + second == expected
+
+def test_split_loads_formats_after_scan_window(tmp_path, sample_fmt_message, sample_data_message, monkeypatch):
+    """Test that FMTs written past the walked head of the log are still found, as a full walk would."""
+    late_fmt = sample_fmt_message[:3] + b"\x02" + sample_fmt_message[4:].replace(b"TEST", b"LATE")
+    late_data = b"\xa3\x95\x02" + sample_data_message[3:]
+    log_file = tmp_path / "late_fmt.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message + sample_data_message * 50 + late_fmt + late_data * 10)
+    monkeypatch.setattr(parallel, "FMT_SCAN_WINDOW", 200)
+
+    with Parser(str(log_file)) as walked:
+        walked._decode_range("FMT", None, None)
+    with Parser(str(log_file)) as parser:
+        ParallelParser._split_to_chunks(parser, max_workers=1)
+        assert parser.offset == 0
+        assert {k: v["Name"] for k, v in parser.format_defs.items()} == {1: "TEST", 2: "LATE"}
+        assert parser.format_defs.keys() == walked.format_defs.keys()
+
+def test_worker_chunks_start_from_shipped_formats(tmp_path, sample_fmt_message, sample_data_message):
+    """Test that an FMT met in one chunk does not change how the worker decodes its next chunk."""
+    redefined = sample_fmt_message.replace(b"TEST", b"ALT\x00")
+    log_file = tmp_path / "redefined.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message + sample_data_message + redefined + sample_data_message * 2)
+    first_end = len(sample_fmt_message + sample_data_message + redefined)
+
+    with Parser(str(log_file)) as parser:
+        parser._extract_format_def(0)
+        format_defs = dict(parser.format_defs)
+
+    ParallelParser._init_worker(str(log_file), format_defs, need_struct_rebuild=False)
+    try:
+        first = ParallelParser._process_range((0, first_end), "ALT")
+        second = ParallelParser._process_range((first_end, first_end + 20), None)
+    finally:
+        _worker.parser.__exit__(None, None, None)
+        del _worker.parser
+
+    assert first == []
+    assert [msg["mavpackettype"] for msg in second] == ["TEST", "TEST"]
+
+@pytest.mark.parametrize("executor_type", ["process", "thread"])
+def test_iter_results_matches_process_all(valid_log_file, executor_type):
+    """Test that spooled results stream back the same messages as process_all."""
+    parser = ParallelParser(valid_log_file, max_workers=2)
+    assert list(parser.iter_results(executor_type=executor_type)) == parser.process_all(executor_type=executor_type)
+    assert list(parser.iter_results("TEST", executor_type)) == parser.process_all("TEST", executor_type)
+    assert list(parser.iter_results(executor_type=executor_type, spool=False)) == parser.process_all(executor_type=executor_type)
+
+@pytest.mark.parametrize("executor_type", ["process", "thread"])
+def test_process_columns_matches_get_columns(valid_log_file, executor_type):
+    """Test that process_columns returns the same columns as Parser.get_columns."""
+    with Parser(valid_log_file) as parser:
+        expected = parser.get_columns("TEST")
+    parser = ParallelParser(valid_log_file, max_workers=2)
+    assert parser.process_columns("TEST", executor_type) == expected
+    assert parser.process_columns("NOPE", executor_type) == {}
+
+@pytest.mark.parametrize("executor_type", ["process", "thread"])
+def test_process_all_columns_matches_get_all_columns(tmp_path, sample_fmt_message, monkeypatch, executor_type):
+    """Test that process_all_columns merges per-chunk columns of every type into Parser.get_all_columns."""
+    other_fmt = struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 7, b"OTH", b"I", b"V")
+    log_file = tmp_path / "columns.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message + other_fmt)
+        for i in range(3000):
+            f.write(b"\xa3\x95\x01" + struct.pack("<BHI", 1, 2, i))
+            f.write(b"\xa3\x95\x02" + struct.pack("<I", i))
+    monkeypatch.setattr(parallel, "MIN_CHUNK_SIZE", 4096)
+    monkeypatch.setattr(parallel, "CHUNK_ALIGNMENT", 4096)
+
+    with Parser(str(log_file)) as parser:
+        assert len(ParallelParser._split_to_chunks(parser, max_workers=4)) > 1
+        expected = parser.get_all_columns()
+    tables = ParallelParser(str(log_file), max_workers=4).process_all_columns(executor_type)
+    assert tables == expected
+    assert tables["OTH"]["V"] == list(range(3000))
+
+@pytest.mark.parametrize("executor_type", ["process", "thread"])
+def test_process_all_keeps_file_order_across_chunks(tmp_path, sample_fmt_message, monkeypatch, executor_type):
+    """Test that multi-chunk results come back in file order as-is, with no merge or sort step."""
+    log_file = tmp_path / "ordered.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        for i in range(3000):
+            f.write(b"\xa3\x95\x01" + struct.pack("<BHI", 1, 2, i))
+    monkeypatch.setattr(parallel, "MIN_CHUNK_SIZE", 4096)
+    monkeypatch.setattr(parallel, "CHUNK_ALIGNMENT", 4096)
+
+    with Parser(str(log_file)) as parser:
+        assert len(ParallelParser._split_to_chunks(parser, max_workers=4)) > 1
+        expected = parser.get_all_messages("TEST")
+    results = ParallelParser(str(log_file), max_workers=4).process_all("TEST", executor_type)
+    assert results == expected
+    assert [msg["C"] for msg in results] == list(range(3000))
+
+def test_map_in_order_bounds_submitted_chunks():
+    """Test that results come back in order while only a bounded number of tasks is submitted ahead."""
+    consumed = []
+
+    def tasks():
+        for i in range(20):
+            consumed.append(i)
+            yield i
+
+    parser = ParallelParser("test.bin", max_workers=1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = parser._map_in_order(executor, str, tasks())
+        assert next(results) == "0"
+        assert len(consumed) <= parallel.CHUNKS_IN_FLIGHT + 1
+        assert list(results) == [str(i) for i in range(1, 20)]
+
+def test_worker_uses_inherited_parser(valid_log_file, monkeypatch):
+    """Test that a forked worker reuses the driver's open parser and compiled formats instead of rebuilding them."""
+    with Parser(valid_log_file) as parser:
+        ParallelParser._split_to_chunks(parser, max_workers=1)
+        monkeypatch.setitem(parallel._inherited, -1, parser)
+        compiled = parser.format_defs
+        ParallelParser._init_worker(valid_log_file, {}, need_struct_rebuild=True, run_id=-1)
+        try:
+            assert _worker.parser is parser
+            assert parser.format_defs is compiled
+            assert len(ParallelParser._process_range((0, len(parser.data)), "TEST")) == 2
+        finally:
+            del _worker.parser
+
+def test_thread_worker_shares_driver_mmap(valid_log_file):
+    """Test that a thread worker gets its own parser over the driver's mapping instead of reopening the log."""
+    with Parser(valid_log_file) as parser:
+        ParallelParser._split_to_chunks(parser, max_workers=1)
+        ParallelParser._init_worker(valid_log_file, parser.format_defs, need_struct_rebuild=False, shared=parser)
+        try:
+            assert _worker.parser is not parser
+            assert _worker.parser.data is parser.data
+            assert len(ParallelParser._process_range((0, len(parser.data)), "TEST")) == 2
+        finally:
+            del _worker.parser
+
+@pytest.mark.parametrize("executor_type", ["process", "thread"])
+def test_overlapping_runs_keep_their_own_parent(valid_log_file, executor_type):
+    """Test that a run finishing inside another does not drop the parent the outer run's workers still need."""
+    parser = ParallelParser(valid_log_file, max_workers=2)
+    expected = parser.process_all(executor_type=executor_type)
+    outer = parser.iter_results(executor_type=executor_type, spool=False)
+    first = next(outer)
+    inherited = dict(parallel._inherited)
+    assert parser.process_all(executor_type=executor_type) == expected
+    assert parallel._inherited == inherited
+    assert [first, *outer] == expected
+    assert parallel._inherited == {}
+
+@pytest.mark.parametrize("executor_class", [ProcessPoolExecutor, ThreadPoolExecutor])
+def test_process_all_reuses_executor(valid_log_file, tmp_path, sample_fmt_message, sample_data_message, executor_class):
+    """Test that one caller-owned executor serves consecutive runs over different files."""
+    other_file = tmp_path / "other.bin"
+    with open(other_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(sample_data_message * 5)
+
+    with executor_class(max_workers=2) as executor:
+        for filename in (valid_log_file, str(other_file), valid_log_file):
+            parser = ParallelParser(filename, max_workers=2)
+            assert parser.process_all(executor=executor) == parser.process_all()
+
+@pytest.mark.parametrize("executor_class", [ProcessPoolExecutor, ThreadPoolExecutor])
+def test_process_columns_reuses_executor(valid_log_file, executor_class):
+    """Test that column-wise runs share a caller-owned executor with process_all."""
+    parser = ParallelParser(valid_log_file, max_workers=2)
+    with executor_class(max_workers=2) as executor:
+        messages = parser.process_all(executor=executor)
+        assert parser.process_columns("TEST", executor=executor) == parser.process_columns("TEST")
+        assert parser.process_all_columns(executor=executor) == parser.process_all_columns()
+        assert parser.process_all(executor=executor) == messages
+
+def test_find_boundary_skips_header_inside_payload(tmp_path, sample_fmt_message, sample_data_message):
+    """Test that a header byte pattern inside a payload is not taken as a chunk cut point."""
+    fake = b"\xa3\x95\x01" + struct.pack("<BHI", 0xA3, 0x0195, 7)
+    log_file = tmp_path / "fake_header.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(fake)
+        f.write(sample_data_message * 3)
+
+    with Parser(str(log_file)) as parser:
+        chunks = ParallelParser._split_to_chunks(parser, max_workers=1)
+        fake_start = len(sample_fmt_message)
+        assert parser.data.find(b"\xa3\x95", fake_start + 1) == fake_start + 3
+        assert ParallelParser._find_boundary(
+            parser.data, fake_start + 1, ParallelParser._length_table(parser.format_defs)
+        ) == fake_start + 10
+        assert chunks == [(0, len(parser.data))]
@@ -1,8 +1,21 @@
+import gc
+import mmap
+import os
 import struct
 import pytest
 from src.business_logic.parser import Parser
 from src.business_logic.parallel import ParallelParser
-from src.utils.helpers import bytes_to_ascii
+from src.utils import helpers
+from src.utils.helpers import (
+    advise,
+    bytes_to_ascii,
+    fadvise,
+    compile_decoder,
+    compile_struct,
+    decode_text,
+    sort_by_time,
+    sort_columns_by_time,
+)
 
 
 def test_parse_empty_file(empty_log_file):
@@ -50,49 +63,70 @@ def test_bytes_to_ascii():
     result = bytes_to_ascii(b"\x00")
     assert result == ""
 
-def test_decode_messages_with_bytes_field():
-    """Test decoding messages with byte fields."""
-    format_defs = {
-        "Format": "Z",
-        "Columns": ["Data"],
+def test_compile_struct_is_cached():
+    """Test that compile_struct reuses one Struct per format string."""
+    compiled = compile_struct("QBIc")
+    assert compiled.format == "<QBIh"
+    assert compile_struct("QBIc") is compiled
+
+def test_compile_struct_translates_multi_char_tokens():
+    """Test that the translation table expands multi-character fragments and rejects unknown chars."""
+    assert compile_struct("anNZ").format == "<32h4s16s64s"
+    with pytest.raises(KeyError):
+        compile_struct("Bx")
+
+def test_compile_decoder_converts_fields():
+    """Test that the generated decoder keeps raw bytes fields, strips text and applies divisors."""
+    unpacked = (5, b"raw\x00\x00", b"NAME\x00\x00", 1000, 376543210)
+
+    decode = compile_decoder("TEST", "QZNcL", ("TimeUS", "Data", "Name", "Alt", "Lat"))
+    assert decode(unpacked) == {
+        "mavpackettype": "TEST",
+        "TimeUS": 5,
+        "Data": b"raw\x00\x00",
+        "Name": "NAME",
+        "Alt": 10.0,
+        "Lat": 376543210 / 1e7,
     }
+
+def test_decode_text_reuses_strings(monkeypatch):
+    """Test that decode_text strips and decodes like the decoder, returns one str per value and stays bounded."""
+    monkeypatch.setattr(helpers, "TEXT_CACHE_SIZE", 2)
+    monkeypatch.setattr(helpers, "_text_cache", {})
+    first = decode_text(b"PARAM_A\x00\x00")
+    assert first == "PARAM_A"
+    assert decode_text(b"PARAM_A\x00\x00") is first
+    decode_text(b"B\x00")
+    decode_text(b"C\x00")
+    assert len(helpers._text_cache) <= 2
+
+def test_compile_decoder_with_bytes_field():
+    """Test decoding messages with byte fields."""
     unpacked = (b"test_data\x00\x00",)
 
-    result = Parser._decode_messages("TEST", format_defs, unpacked)
+    result = compile_decoder("TEST", "Z", ("Data",))(unpacked)
     assert result["mavpackettype"] == "TEST"
     assert isinstance(result["Data"], bytes)
 
-def test_decode_messages_with_scale_factor():
+def test_compile_decoder_with_scale_factor():
     """Test decoding messages with scale factor fields."""
-    format_defs = {
-        "Format": "c",
-        "Columns": ["Alt"],
-    }
     unpacked = (1000,)
 
-    result = Parser._decode_messages("TEST", format_defs, unpacked)
+    result = compile_decoder("TEST", "c", ("Alt",))(unpacked)
     assert result["Alt"] == 10.0
 
-def test_decode_messages_with_lat_lon():
+def test_compile_decoder_with_lat_lon():
     """Test decoding messages with latitude/longitude."""
-    format_defs = {
-        "Format": "L",
-        "Columns": ["Lat"],
-    }
     unpacked = (376543210,)
 
-    result = Parser._decode_messages("GPS", format_defs, unpacked)
+    result = compile_decoder("GPS", "L", ("Lat",))(unpacked)
     assert abs(result["Lat"] - 37.6543210) < 0.0000001
 
-def test_decode_messages_error_handling():
-    """Test that decode handles errors gracefully."""
-    format_defs = {
-        "Format": "B",
-        "Columns": ["Field"],
-    }
+def test_compile_decoder_passes_through_missing_value():
+    """Test that a field without a conversion is passed through as is, even when it is missing."""
     unpacked = (None,)
 
-    result = Parser._decode_messages("TEST", format_defs, unpacked)
+    result = compile_decoder("TEST", "B", ("Field",))(unpacked)
     assert "Field" in result
 
 def test_messages_with_end_index(valid_log_file):
@@ -175,6 +209,17 @@ def test_zero_length_message_type(tmp_path):
     with Parser(str(log_file)) as parser:
         messages = list(parser.messages())
 
+def test_zero_length_messages_do_not_stall(tmp_path):
+    """Test that messages of a type declared with length 0 are skipped instead of re-read forever."""
+    log_file = tmp_path / "zero_len_data.bin"
+    with open(log_file, "wb") as f:
+        f.write(struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 1, 0, b"TST", b"B", b"A"))
+        f.write(b"\xa3\x95\x01\x05" * 2)
+
+    with Parser(str(log_file)) as parser:
+        assert list(parser.messages()) == []
+        assert parser.format_defs == {}
+
 def test_unicode_in_field_names(tmp_path):
     """Test handling of non-ASCII characters in field names."""
     log_file = tmp_path / "unicode.bin"
@@ -203,3 +248,233 @@ def test_chunk_size_edge_cases(valid_log_file):
         list(parser.messages("FMT"))
         chunks = ParallelParser._split_to_chunks(parser, 100)
         assert len(chunks) >= 1
+
+def test_resync_after_garbage(tmp_path, sample_fmt_message, sample_data_message):
+    """Test that parsing resumes at the next header after non-message bytes."""
+    log_file = tmp_path / "garbage.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(sample_data_message)
+        f.write(b"\x01\x02\xa3\x03")
+        f.write(sample_data_message)
+
+    with Parser(str(log_file)) as parser:
+        messages = list(parser.messages("TEST"))
+        assert len(messages) == 2
+        assert messages[0] == messages[1]
+
+def test_consecutive_messages_decoded_as_run(valid_log_file):
+    """Test that a run of same-type messages decodes every record and advances the offset."""
+    with Parser(valid_log_file) as parser:
+        messages = list(parser.messages("TEST"))
+        assert messages == [{"mavpackettype": "TEST", "A": 255, "B": 1000, "C": 100000}] * 2
+        assert parser.offset == len(parser.data)
+
+def test_get_columns_matches_messages(valid_log_file):
+    """Test that get_columns returns the same values as get_all_messages, column-wise."""
+    with Parser(valid_log_file) as parser:
+        messages = parser.get_all_messages("TEST")
+        parser.offset = 0
+        columns = parser.get_columns("TEST")
+
+    assert columns == {col: [msg[col] for msg in messages] for col in ("A", "B", "C")}
+
+def test_get_all_columns_matches_get_columns(valid_log_file):
+    """Test that get_all_columns returns every type as get_columns would, from one walk, leaving GC as it was."""
+    with Parser(valid_log_file) as parser:
+        expected = parser.get_columns("TEST")
+        parser.offset = 0
+        assert parser.get_all_columns() == {"TEST": expected}
+        assert gc.isenabled()
+
+def test_get_columns_unknown_type(valid_log_file):
+    """Test that get_columns returns an empty mapping for an unknown message type."""
+    with Parser(valid_log_file) as parser:
+        assert parser.get_columns("NOPE") == {}
+
+def test_get_all_columns_redefined_id(tmp_path):
+    """Test that rows read before an FMT redefines their id keep the old definition's name and columns."""
+    log_file = tmp_path / "redefined.bin"
+    with open(log_file, "wb") as f:
+        f.write(struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 12, b"TST", b"QB", b"TimeUS,A"))
+        for i in range(3):
+            f.write(b"\xa3\x95\x02" + struct.pack("<QB", i, i + 10))
+        f.write(struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 7, b"OTH", b"I", b"V"))
+        for i in range(2):
+            f.write(b"\xa3\x95\x02" + struct.pack("<I", i + 100))
+
+    with Parser(str(log_file)) as parser:
+        assert parser.get_all_columns() == {
+            "TST": {"TimeUS": [0, 1, 2], "A": [10, 11, 12]},
+            "OTH": {"V": [100, 101]},
+        }
+
+def test_get_columns_redefined_type(tmp_path):
+    """Test that get_columns decodes each row with its own definition when a type's format changes mid-log."""
+    log_file = tmp_path / "redefined_type.bin"
+    with open(log_file, "wb") as f:
+        f.write(struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 12, b"TST", b"QB", b"TimeUS,A"))
+        f.write(b"\xa3\x95\x02" + struct.pack("<QB", 1, 10))
+        f.write(struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 13, b"TST", b"QH", b"TimeUS,B"))
+        f.write(b"\xa3\x95\x02" + struct.pack("<QH", 2, 2000))
+
+    with Parser(str(log_file)) as parser:
+        expected = parser.get_all_messages("TST")
+    with Parser(str(log_file)) as parser:
+        columns = parser.get_columns("TST")
+    assert columns == {"TimeUS": [1, 2], "A": [10, None], "B": [None, 2000]}
+    assert [m["TimeUS"] for m in expected] == columns["TimeUS"]
+
+def test_records_match_messages(valid_log_file):
+    """Test that records() yields namedtuples equivalent to the message dicts."""
+    with Parser(valid_log_file) as parser:
+        messages = parser.get_all_messages()
+        parser.offset = 0
+        records = list(parser.records())
+
+    assert [record._asdict() for record in records] == messages
+    assert records[-1].mavpackettype == "TEST"
+    assert records[-1].B == 1000
+
+def test_advise_unaligned_range(valid_log_file):
+    """Test that advise and fadvise accept unaligned ranges, bad fds and unsupported options without raising."""
+    with Parser(valid_log_file) as parser:
+        advise(parser.data, getattr(mmap, "MADV_WILLNEED", None), 7, 20)
+        advise(parser.data, None)
+        fadvise(parser._file.fileno(), getattr(os, "POSIX_FADV_WILLNEED", None), 7, 20)
+        fadvise(-1, getattr(os, "POSIX_FADV_WILLNEED", None))
+        fadvise(parser._file.fileno(), None)
+        assert len(parser.get_all_messages()) == 3
+
+def test_messages_rereads_released_windows(valid_log_file):
+    """Test that windows released by messages() read back identically on a second walk."""
+    with Parser(valid_log_file) as parser:
+        streamed = list(parser.messages())
+        parser.offset = 0
+        assert parser.get_all_messages() == streamed
+        assert len(streamed) == 3
+
+def test_messages_end_index_zero(valid_log_file):
+    """Test that end_index=0 is an empty range rather than the whole file."""
+    with Parser(valid_log_file) as parser:
+        assert list(parser.messages(end_index=0)) == []
+        assert parser.offset == 0
+
+def test_messages_end_index_bounds_resync(tmp_path, sample_fmt_message, sample_data_message):
+    """Test that a header found past end_index after garbage is left for the next range."""
+    log_file = tmp_path / "bounded.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(b"\x01\x02\x03")
+        f.write(sample_data_message)
+
+    with Parser(str(log_file)) as parser:
+        end = len(sample_fmt_message) + 2
+        assert [m["mavpackettype"] for m in parser.messages(end_index=end)] == ["FMT"]
+        assert list(parser.messages("TEST")) == [{"mavpackettype": "TEST", "A": 255, "B": 1000, "C": 100000}]
+
+def test_trailing_partial_header(tmp_path, sample_fmt_message, sample_data_message):
+    """Test that a lone header byte at the end of the file stops parsing cleanly."""
+    log_file = tmp_path / "trailing.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(sample_data_message)
+        f.write(b"\xa3")
+
+    with Parser(str(log_file)) as parser:
+        assert len(list(parser.messages("TEST"))) == 1
+        assert parser.offset == len(parser.data) - 1
+
+def test_filtered_walk_keeps_reading_fmt(tmp_path, sample_fmt_message, sample_data_message):
+    """Test that a type filter skips other types by id but still loads FMT-for-FMT and late FMTs."""
+    fmt_of_fmt = struct.pack(
+        "<2sBBB4s16s64s", b"\xa3\x95", 128, 128, 89, b"FMT", b"BBnNZ", b"Type,Length,Name,Format,Columns"
+    )
+    other_fmt = struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 5, b"OTH", b"H", b"X")
+    log_file = tmp_path / "filtered.bin"
+    with open(log_file, "wb") as f:
+        f.write(fmt_of_fmt)
+        f.write(other_fmt)
+        f.write(b"\xa3\x95\x02" + struct.pack("<H", 7))
+        f.write(sample_fmt_message)
+        f.write(sample_data_message)
+
+    with Parser(str(log_file)) as parser:
+        assert [m["A"] for m in parser.messages("TEST")] == [255]
+        assert parser.offset == len(parser.data)
+
+def test_sort_by_time():
+    """Test that sort_by_time orders by TimeUS, keeps ties stable and puts untimed messages first."""
+    messages = [
+        {"mavpackettype": "GPS", "TimeUS": 20},
+        {"mavpackettype": "FMT"},
+        {"mavpackettype": "IMU", "TimeUS": 10},
+        {"mavpackettype": "BARO", "TimeUS": 20},
+    ]
+    assert sort_by_time(messages) is messages
+    assert [m["mavpackettype"] for m in messages] == ["FMT", "IMU", "GPS", "BARO"]
+
+def test_sort_by_time_records(tmp_path):
+    """Test that sort_by_time orders Parser.records() namedtuples, with or without FMT records among them."""
+    fmt = struct.pack("<2sBBB4s16s64s", b"\xa3\x95", 128, 2, 12, b"TIM", b"QB", b"TimeUS,V")
+    log_file = tmp_path / "records.bin"
+    with open(log_file, "wb") as f:
+        f.write(fmt)
+        for time_us, value in ((30, 1), (10, 2), (20, 3)):
+            f.write(b"\xa3\x95\x02" + struct.pack("<QB", time_us, value))
+
+    with Parser(str(log_file)) as parser:
+        records = list(parser.records())
+    assert [r.V for r in sort_by_time(records[1:])] == [2, 3, 1]
+    assert [getattr(r, "V", None) for r in sort_by_time(records)] == [None, 2, 3, 1]
+
+def test_get_all_records_matches_records(valid_log_file):
+    """Test that get_all_records returns the same namedtuples as the records() generator."""
+    with Parser(valid_log_file) as parser:
+        expected = list(parser.records())
+    with Parser(valid_log_file) as parser:
+        assert parser.get_all_records() == expected
+    with Parser(valid_log_file) as parser:
+        assert parser.get_all_records("TEST") == [r for r in expected if r.mavpackettype == "TEST"]
+
+def test_sort_columns_by_time():
+    """Test that sort_columns_by_time reorders every column by TimeUS, stable on ties."""
+    columns = {"TimeUS": [30, 10, 30, 20], "V": [1, 2, 3, 4], "Name": ["a", "b", "c", "d"]}
+    assert sort_columns_by_time(columns) is columns
+    assert columns == {"TimeUS": [10, 20, 30, 30], "V": [2, 4, 1, 3], "Name": ["b", "d", "a", "c"]}
+    assert sort_columns_by_time({"V": [2, 1]}) == {"V": [2, 1]}
+    ordered = {"TimeUS": [1, 2, 2], "V": [3, 1, 2]}
+    assert sort_columns_by_time(ordered) == {"TimeUS": [1, 2, 2], "V": [3, 1, 2]}
+
+def test_messages_window_matches_decode_range(tmp_path, sample_fmt_message, sample_data_message, monkeypatch):
+    """Test that the windowed messages() generator yields exactly what a single list decode returns."""
+    log_file = tmp_path / "windows.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(sample_data_message * 3)
+        f.write(b"\x01\x02\xa3\x03")
+        f.write(sample_data_message * 2)
+
+    with Parser(str(log_file)) as parser:
+        expected = parser.get_all_messages()
+    monkeypatch.setattr("src.business_logic.parser.DECODE_WINDOW", 5)
+    with Parser(str(log_file)) as parser:
+        assert list(parser.messages()) == expected
+        assert len(expected) == 6
+        assert parser.offset == len(parser.data)
+
+def test_message_batches_match_get_all_messages(tmp_path, sample_fmt_message, sample_data_message, monkeypatch):
+    """Test that message_batches yields the messages as non-empty lists, one per decoded window."""
+    log_file = tmp_path / "batches.bin"
+    with open(log_file, "wb") as f:
+        f.write(sample_fmt_message)
+        f.write(sample_data_message * 40)
+
+    with Parser(str(log_file)) as parser:
+        expected = parser.get_all_messages("TEST")
+    monkeypatch.setattr("src.business_logic.parser.DECODE_WINDOW", 100)
+    with Parser(str(log_file)) as parser:
+        batches = list(parser.message_batches("TEST"))
+    assert len(batches) > 1
+    assert all(batches)
+    assert [msg for batch in batches for msg in batch] == expected